@@ -1,17 +1,11 @@
-import sys
-from pathlib import Path
-
-# 添加src目录到路径
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
-from crawlers.base import BaseCrawler, NewsItem
-from crawlers.rss_crawler import RSSCrawler
-from crawlers.hackernews import HackerNewsCrawler
-from crawlers.reddit import RedditCrawler
-from crawlers.huggingface import HuggingFaceCrawler
-from crawlers.nitter import NitterCrawler
-from crawlers.wechat import WeixinCrawler
-from crawlers.weibo import WeiboCrawler
+from .base import BaseCrawler, NewsItem
+from .rss_crawler import RSSCrawler
+from .hackernews import HackerNewsCrawler
+from .reddit import RedditCrawler
+from .huggingface import HuggingFaceCrawler
+from .nitter import NitterCrawler
+from .wechat import WeixinCrawler
+from .weibo import WeiboCrawler
 
 __all__ = [
     'BaseCrawler',
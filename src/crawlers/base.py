@@ -1,18 +1,14 @@
 """
 基础爬虫类和数据模型
 """
-import sys
 import time
 import logging
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from datetime import datetime
-from pathlib import Path
 from typing import List, Optional
 import requests
 
-# 添加src目录到路径
-sys.path.insert(0, str(Path(__file__).parent.parent))
 from config import get_crawler_config
 
 logger = logging.getLogger(__name__)
@@ -2,16 +2,14 @@
 Hacker News API爬虫
 使用官方Firebase API获取热门AI相关文章
 """
-import sys
 import logging
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from pathlib import Path
 from typing import List, Optional
 
-# 添加src目录到路径
-sys.path.insert(0, str(Path(__file__).parent.parent))
-from crawlers.base import BaseCrawler, NewsItem
+from bs4 import BeautifulSoup
+
+from .base import BaseCrawler, NewsItem
 
 logger = logging.getLogger(__name__)
 
@@ -81,10 +79,10 @@ class HackerNewsCrawler(BaseCrawler):
             if data.get("time"):
                 pub_date = datetime.fromtimestamp(data["time"])
             
-            # 构建摘要
+            # 构建摘要（HN 的 text 字段是 HTML，含 <p> 与 &#x27; 等实体）
             summary = ""
             if data.get("text"):
-                summary = data["text"][:500]
+                summary = BeautifulSoup(data["text"], "html.parser").get_text(separator=" ", strip=True)[:500]
             
             # 添加评论数信息
             descendants = data.get("descendants", 0)
@@ -3,20 +3,16 @@ Hugging Face Papers 爬虫
 爬取 https://huggingface.co/papers 获取每日热门论文
 并调用 Arxiv API 获取详细摘要
 """
-import sys
 import logging
 import re
 from datetime import datetime
-from pathlib import Path
 from typing import List, Optional
 
 import requests
 import feedparser
 from bs4 import BeautifulSoup
 
-# 添加src目录到路径
-sys.path.insert(0, str(Path(__file__).parent.parent))
-from crawlers.base import BaseCrawler, NewsItem
+from .base import BaseCrawler, NewsItem
 
 logger = logging.getLogger(__name__)
 
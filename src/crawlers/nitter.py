@@ -4,20 +4,16 @@ Twitter/X 爬虫 (通过 Nitter 实例)
 """
 import logging
 import random
-import sys
 import time
 import re
 from datetime import datetime, timedelta
-from pathlib import Path
 from typing import List, Optional
 from email.utils import parsedate_to_datetime
 import urllib.parse
 
 import feedparser
 
-# 添加src目录到路径
-sys.path.insert(0, str(Path(__file__).parent.parent))
-from crawlers.base import BaseCrawler, NewsItem
+from .base import BaseCrawler, NewsItem
 from config import NITTER_INSTANCES, TWITTER_USERS
 
 logger = logging.getLogger(__name__)
@@ -2,18 +2,14 @@
 Reddit爬虫 - RSS版本
 无需API凭据即可获取r/MachineLearning和r/ArtificialInteligence热门帖子
 """
-import sys
 import logging
 import re
 from datetime import datetime
-from pathlib import Path
 from typing import List, Optional
 import feedparser
 from bs4 import BeautifulSoup
 
-# 添加src目录到路径
-sys.path.insert(0, str(Path(__file__).parent.parent))
-from crawlers.base import BaseCrawler, NewsItem
+from .base import BaseCrawler, NewsItem
 
 logger = logging.getLogger(__name__)
 
@@ -2,20 +2,16 @@
 RSS通用爬虫
 支持36氪、虎嗅、TechCrunch、The Verge等RSS源
 """
-import sys
 import logging
 import re
 from datetime import datetime, timedelta
-from pathlib import Path
 from typing import List, Optional
 from email.utils import parsedate_to_datetime
 
 import feedparser
 from bs4 import BeautifulSoup
 
-# 添加src目录到路径
-sys.path.insert(0, str(Path(__file__).parent.parent))
-from crawlers.base import BaseCrawler, NewsItem
+from .base import BaseCrawler, NewsItem
 from config import RSS_SOURCES
 
 logger = logging.getLogger(__name__)
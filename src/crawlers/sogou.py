@@ -3,20 +3,16 @@
 注意：搜狗有强反爬机制，此爬虫可能不稳定
 仅用于个人学习研究目的
 """
-import sys
 import logging
 import re
 import random
 from datetime import datetime
-from pathlib import Path
 from typing import List, Optional
 from urllib.parse import quote_plus, urljoin
 
 from bs4 import BeautifulSoup
 
-# 添加src目录到路径
-sys.path.insert(0, str(Path(__file__).parent.parent))
-from crawlers.base import BaseCrawler, NewsItem
+from .base import BaseCrawler, NewsItem
 
 logger = logging.getLogger(__name__)
 
@@ -2,18 +2,14 @@
 微信公众号爬虫
 通过今日热榜 (tophub.today) 获取微信热门文章
 """
-import sys
 import logging
 import re
 from datetime import datetime
-from pathlib import Path
 from typing import List, Optional
 
 from bs4 import BeautifulSoup
 
-# 添加src目录到路径
-sys.path.insert(0, str(Path(__file__).parent.parent))
-from crawlers.base import BaseCrawler, NewsItem
+from .base import BaseCrawler, NewsItem
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +12,7 @@ import requests
 from bs4 import BeautifulSoup
 import urllib.parse
 
-from crawlers.base import BaseCrawler, NewsItem
+from .base import BaseCrawler, NewsItem
 
 logger = logging.getLogger(__name__)
 
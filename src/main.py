@@ -114,14 +114,19 @@ def process_news(items: List[NewsItem], top_n: int = 30) -> List[NewsItem]:
     
     # 4. 翻译
     trans_config = get_translation_config()
-    if trans_config.enabled and trans_config.is_configured:
+    # 未配置 API Key 时 Translator 会降级到免费接口
+    if trans_config.enabled:
         logger.info("=" * 50)
         logger.info("正在翻译新闻...")
+        translator = None
         try:
             translator = Translator(trans_config)
             top_items = translator.translate_batch(top_items)
         except Exception as e:
             logger.error(f"翻译过程出错: {e}")
+        finally:
+            if translator is not None:
+                translator.close()
     
     return top_items
 
@@ -2,7 +2,6 @@
 邮件发送模块
 使用SMTP发送HTML格式的邮件
 """
-import sys
 import logging
 import smtplib
 from email.mime.text import MIMEText
@@ -13,8 +12,6 @@ from typing import List, Optional
 
 from jinja2 import Environment, FileSystemLoader
 
-# 添加src目录到路径
-sys.path.insert(0, str(Path(__file__).parent.parent))
 from crawlers.base import NewsItem
 from config import get_email_config, EmailConfig
 
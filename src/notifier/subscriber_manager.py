@@ -1,15 +1,21 @@
-import imaplib
-import email
+import json
 import logging
 import os
 import re
 import smtplib
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from email.mime.text import MIMEText
+from email.parser import BytesHeaderParser, BytesParser
+from email.policy import default as default_policy
 from email.utils import formatdate, parseaddr
+from functools import cached_property
 from pathlib import Path
-from typing import Set, List, Dict, Optional
+from typing import Set, List, Dict, Iterator, Optional, Tuple
+
+import lxml.html
+from imapclient import IMAPClient
 
 # 将项目根目录和src目录添加到路径
 # __file__ 是 src/notifier/subscriber_manager.py
@@ -29,18 +35,52 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# 使用现代 policy，头部按 RFC 2047 自动解码
+_HEADER_PARSER = BytesHeaderParser(policy=default_policy)
+_MESSAGE_PARSER = BytesParser(policy=default_policy)
+
+# 邮件 HTML 正文按 UTF-8 解析，与纯文本正文保持一致
+_HTML_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+# 只拉取发件人、标题及解析正文所需的 MIME 头部，外加正文
+_FETCH_PARTS = [
+    'BODY.PEEK[HEADER.FIELDS (FROM SUBJECT MIME-VERSION CONTENT-TYPE CONTENT-TRANSFER-ENCODING)]',
+    'BODY.PEEK[TEXT]',
+]
+
+# 意图识别正则（模块加载时编译一次）
+_UNSUB_RE = re.compile(r'(取消订阅|退订|停止|取消|unsubscribe|stop).*(AI)?(资讯)?日报', re.IGNORECASE)
+_SUB_RE = re.compile(r'(订阅|加入|启动|开始|subscribe|start).*(AI)?(资讯)?日报', re.IGNORECASE)
+_AMBIGUOUS_RE = re.compile(r'AI资讯日报|AI日报', re.IGNORECASE)
+
+# 所有订阅/退订/模糊意图的正则都要求出现该关键字
+_INTENT_KEYWORD = "日报"
+_INTENT_KEYWORD_BYTES = _INTENT_KEYWORD.encode("utf-8")
+
 class SubscriberManager:
+    # 追加写入的未排序行数达到该值时重写整个文件
+    COMPACT_THRESHOLD = 50
+    # 每次 FETCH 的邮件数量
+    FETCH_BATCH_SIZE = 50
+    # 并行解析邮件的线程数
+    CLASSIFY_WORKERS = 8
+
     def __init__(self):
         # data 目录在项目根目录
         self.root_dir = src_dir.parent
         self.data_dir = self.root_dir / "data"
         self.subscriber_file = self.data_dir / "subscribers.txt"
+        self.imap_state_file = self.data_dir / ".imap_state.json"
         self.data_dir.mkdir(exist_ok=True)
         
         self.config = get_email_config()
         self.user = self.config.username
         self.password = self.config.password
         self.imap_server = "imap.gmail.com"
+        self._unsorted_lines = 0
+        # 与文件内容一致的订阅名单，首次读取后缓存，写入后同步更新
+        self._subs_cache: Optional[Set[str]] = None
+        self._subs_dirty = False
 
     def process_all_requests(self):
         """处理订阅请求，遵循‘最后一次操作为准’并支持纠错引导"""
@@ -50,153 +90,376 @@ class SubscriberManager:
 
         try:
             logger.info(f"正在连接 IMAP 服务器: {self.imap_server}...")
-            mail = imaplib.IMAP4_SSL(self.imap_server)
-            mail.login(self.user, self.password)
-            mail.select("inbox")
-
-            # 扫描最近 7 天的邮件
-            since_date = (datetime.now() - timedelta(days=7)).strftime("%d-%b-%Y")
-            search_query = f'(SINCE "{since_date}")'
-            status, messages = mail.search(None, search_query)
-            
-            if status != 'OK': return
 
-            message_nums = messages[0].split()
-            logger.info(f"发现 {len(message_nums)} 封最近邮件，正在进行意图分析...")
+            with IMAPClient(self.imap_server, ssl=True) as client:
+                client.login(self.user, self.password)
+                folder_info = client.select_folder("INBOX")
 
-            user_intents: Dict[str, str] = {} # {email: 'subscribe'|'unsubscribe'|'invalid'}
+                # UIDVALIDITY 未变时只扫描上次之后的新邮件，否则回退为扫描最近 7 天
+                uidvalidity = folder_info.get(b'UIDVALIDITY')
+                state = self._load_imap_state()
+                last_uid = 0
+                if uidvalidity is not None and state.get("uidvalidity") == uidvalidity:
+                    last_uid = int(state.get("last_uid", 0))
+                    criteria = ['UID', f'{last_uid + 1}:*']
+                else:
+                    criteria = ['SINCE', (datetime.now() - timedelta(days=7)).date()]
 
-            for num in message_nums:
-                try:
-                    res, msg_data = mail.fetch(num, '(RFC822)')
-                    for response_part in msg_data:
-                        if isinstance(response_part, tuple):
-                            msg = email.message_from_bytes(response_part[1])
-                            
-                            # 1. 提取发件人 (标准化)
-                            _, email_addr = parseaddr(msg.get("From", ""))
-                            if not email_addr: continue
-                            email_addr = email_addr.lower().strip()
-
-                            # 2. 解析标题和内容
-                            subject = self._decode_header(msg.get("Subject", ""))
-                            body = self._get_text_content(msg)
-                            full_text = (subject + body).replace(" ", "").replace("\n", "").replace("\r", "")
-
-                            # 3. 意图识别 (正则表达式)
-                            unsub_pattern = re.compile(r'(取消订阅|退订|停止|取消|unsubscribe|stop).*(AI)?(资讯)?日报', re.IGNORECASE)
-                            sub_pattern = re.compile(r'(订阅|加入|启动|开始|subscribe|start).*(AI)?(资讯)?日报', re.IGNORECASE)
-                            ambiguous_pattern = re.compile(r'AI资讯日报|AI日报', re.IGNORECASE)
-
-                            unsub_match = unsub_pattern.search(full_text)
-                            sub_match = sub_pattern.search(full_text)
-
-                            if unsub_match:
-                                user_intents[email_addr] = 'unsubscribe'
-                                logger.info(f"检测到退订意图: {email_addr} (匹配: {unsub_match.group()})")
-                            elif sub_match:
-                                user_intents[email_addr] = 'subscribe'
-                                logger.info(f"检测到订阅意图: {email_addr} (匹配: {sub_match.group()})")
-                            elif ambiguous_pattern.search(full_text):
-                                if email_addr not in user_intents:
-                                    user_intents[email_addr] = 'invalid'
-                                
-                except Exception as e:
-                    logger.error(f"解析邮件失败: {e}")
-
-            mail.logout()
+                # "n:*" 在没有新邮件时仍会返回最大 UID，需要再过滤一次
+                message_uids = [uid for uid in self._search_candidates(client, criteria) if uid > last_uid]
+                logger.info(f"发现 {len(message_uids)} 封新邮件，正在进行意图分析...")
+
+                # 在主线程中分批拉取邮件，解析与意图识别交给线程池并行处理
+                raw_stream = self._fetch_messages(client, message_uids)
+                with ThreadPoolExecutor(max_workers=self.CLASSIFY_WORKERS) as executor:
+                    results = list(executor.map(self._classify_message, raw_stream))
+
+            # executor.map 保持 UID 顺序，按顺序应用即可保证“最后一次操作为准”
+            user_intents: Dict[str, str] = {} # {email: 'subscribe'|'unsubscribe'|'invalid'}
+            for result in results:
+                if result is None: continue
+                email_addr, action, matched = result
+                if action == 'unsubscribe':
+                    user_intents[email_addr] = 'unsubscribe'
+                    logger.info(f"检测到退订意图: {email_addr} (匹配: {matched})")
+                elif action == 'subscribe':
+                    user_intents[email_addr] = 'subscribe'
+                    logger.info(f"检测到订阅意图: {email_addr} (匹配: {matched})")
+                elif email_addr not in user_intents:
+                    user_intents[email_addr] = 'invalid'
             
             if user_intents:
                 self._apply_intents(user_intents)
             else:
                 logger.info("未发现新的订阅相关邮件")
 
+            if uidvalidity is not None:
+                # 进度只推进到实际拉取过的最大 UID，未被服务端搜索返回的新邮件下次仍会重新搜索
+                self._save_imap_state(uidvalidity, max(message_uids, default=last_uid))
+
         except Exception as e:
             logger.error(f"IMAP操作异常: {e}")
 
-    def _decode_header(self, raw_str: str) -> str:
+    def _search_candidates(self, client: IMAPClient, criteria: list) -> List[int]:
+        """
+        在服务端只搜索标题或正文包含意图关键字的邮件
+
+        服务器不支持 UTF-8 搜索时退回为不带关键字过滤的搜索
+        """
+        keyword_criteria = criteria + ['OR', 'SUBJECT', _INTENT_KEYWORD, 'BODY', _INTENT_KEYWORD]
         try:
-            from email.header import decode_header
-            parts = decode_header(raw_str)
-            return "".join([
-                part.decode(enc or 'utf-8', errors='ignore') if isinstance(part, bytes) else part 
-                for part, enc in parts
-            ])
-        except Exception: return str(raw_str)
-
-    def _get_text_content(self, msg) -> str:
-        text = ""
-        if msg.is_multipart():
-            for part in msg.walk():
+            return client.search(keyword_criteria, charset='UTF-8')
+        except IMAPClient.Error as e:
+            logger.warning(f"服务端关键字搜索失败，改为全量扫描: {e}")
+            return client.search(criteria)
+
+    def _fetch_messages(self, client: IMAPClient, uids: List[int]) -> Iterator[bytes]:
+        """
+        按批次拉取邮件，按 UID 顺序逐封产出
+
+        只取意图识别需要的头部和正文（PEEK 不会把邮件标记为已读），
+        拼接后即可按完整邮件解析
+        """
+        for i in range(0, len(uids), self.FETCH_BATCH_SIZE):
+            batch = uids[i:i + self.FETCH_BATCH_SIZE]
+            response = client.fetch(batch, _FETCH_PARTS)
+            for uid in batch:
+                if uid not in response: continue
+                header, text = b"", b""
+                for key, value in response[uid].items():
+                    if key.startswith(b"BODY[HEADER"):
+                        header = value or b""
+                    elif key.startswith(b"BODY[TEXT"):
+                        text = value or b""
+                yield header + text
+
+    def _classify_message(self, raw: bytes) -> Optional[Tuple[str, str, str]]:
+        """解析单封邮件，返回 (发件人, 意图, 匹配文本)，无相关意图时返回 None"""
+        try:
+            # 先只解析头部，标题已按 RFC 2047 解码
+            headers = _HEADER_PARSER.parsebytes(raw)
+
+            # 1. 提取发件人 (标准化)
+            _, email_addr = parseaddr(headers["From"] or "")
+            if not email_addr: return None
+            email_addr = email_addr.lower().strip()
+
+            # 2. 退订优先：只有标题已是退订时才能跳过正文解析，
+            #    标题为订阅（如回复 "Re: 订阅AI资讯日报"）时正文里的退订仍然生效
+            subject = self._strip_whitespace(headers["Subject"] or "")
+            intent = self._detect_intent(subject)
+            if intent is None or intent[0] != 'unsubscribe':
+                msg = _MESSAGE_PARSER.parsebytes(raw)
+                # 标题中没有关键字时，正文也必须包含关键字才值得解码
+                keyword = None if _INTENT_KEYWORD in subject else _INTENT_KEYWORD_BYTES
+                body = self._get_text_content(msg, keyword)
+                full_text = subject + self._strip_whitespace(body)
+                intent = self._detect_intent(full_text) or (
+                    ('invalid', '') if self._is_ambiguous(full_text) else None
+                )
+
+            if intent is None: return None
+            return (email_addr, *intent)
+        except Exception as e:
+            logger.error(f"解析邮件失败: {e}")
+            return None
+
+    def _load_imap_state(self) -> Dict[str, int]:
+        """读取上次扫描的 UIDVALIDITY 和最大 UID"""
+        if not self.imap_state_file.exists(): return {}
+        try:
+            with open(self.imap_state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取 IMAP 扫描状态失败，将全量扫描: {e}")
+            return {}
+
+    def _save_imap_state(self, uidvalidity: int, last_uid: int):
+        """保存扫描进度"""
+        self._atomic_write(
+            self.imap_state_file, json.dumps({"uidvalidity": uidvalidity, "last_uid": last_uid})
+        )
+
+    @staticmethod
+    def _atomic_write(path: Path, content: str):
+        """写入同目录下的临时文件并落盘后原子替换，避免中途失败留下半截文件"""
+        tmp_file = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+
+    @staticmethod
+    def _strip_whitespace(text: str) -> str:
+        return text.replace(" ", "").replace("\n", "").replace("\r", "")
+
+    def _detect_intent(self, text: str) -> Optional[Tuple[str, str]]:
+        """意图识别 (正则表达式)，返回 (意图, 匹配文本)，退订优先"""
+        unsub_match = _UNSUB_RE.search(text)
+        if unsub_match:
+            return 'unsubscribe', unsub_match.group()
+        sub_match = _SUB_RE.search(text)
+        if sub_match:
+            return 'subscribe', sub_match.group()
+        return None
+
+    def _is_ambiguous(self, text: str) -> bool:
+        return bool(_AMBIGUOUS_RE.search(text))
+
+    def _first_text_part(self, msg):
+        """
+        非递归地单次遍历 MIME 树查找正文部分
+
+        遇到第一个 text/plain 立即返回；没有纯文本时返回第一个 text/html，都没有则返回 None
+        """
+        html_part = None
+        stack = [msg]
+        while stack:
+            part = stack.pop()
+            if part.is_multipart():
+                stack.extend(reversed(part.get_payload()))
+            else:
                 content_type = part.get_content_type()
                 if content_type == "text/plain":
-                    try:
-                        payload = part.get_payload(decode=True)
-                        if payload: text += payload.decode('utf-8', errors='ignore')
-                    except Exception: pass
-                elif content_type == "text/html":
-                    try:
-                        payload = part.get_payload(decode=True)
-                        if payload:
-                            html_content = payload.decode('utf-8', errors='ignore')
-                            text += re.sub(r'<[^>]+>', '', html_content)
-                    except Exception: pass
+                    return part
+                if content_type == "text/html" and html_part is None:
+                    html_part = part
+        return html_part
+
+    @staticmethod
+    def _html_to_text(payload: bytes) -> str:
+        """用 lxml 解析 HTML 并提取文本，忽略脚本和样式"""
+        doc = lxml.html.document_fromstring(payload, parser=_HTML_PARSER)
+        for element in doc.xpath('//script|//style'):
+            element.drop_tree()
+        return doc.text_content()
+
+    def _get_text_content(self, msg, keyword: Optional[bytes] = None) -> str:
+        """
+        提取邮件正文文本
+
+        keyword 非空时先在正文的原始字节中查找（忽略空白，HTML 部分除外），
+        找不到则直接返回空字符串，省去解码
+        """
+        text = ""
+        if msg.is_multipart():
+            # multipart/alternative 的纯文本与 HTML 内容相同，只解码其中一份
+            try:
+                part = self._first_text_part(msg)
+                payload = part.get_payload(decode=True) if part is not None else None
+                if payload:
+                    if part.get_content_type() == "text/html":
+                        return self._html_to_text(payload)
+                    if keyword and keyword not in payload.translate(None, b" \r\n"):
+                        return ""
+                    return payload.decode('utf-8', errors='ignore')
+            except Exception: pass
         else:
             try:
                 payload = msg.get_payload(decode=True)
                 if isinstance(payload, bytes):
+                    if keyword and keyword not in payload.translate(None, b" \r\n"):
+                        return ""
                     text = payload.decode('utf-8', errors='ignore')
             except Exception: pass
         return text
 
     def _apply_intents(self, intents: Dict[str, str]):
-        current_subs = self.load_subscribers()
-        original_subs = set(current_subs)
-        
+        # 同类回执内容完全相同，按类别分组后各发送一封密送邮件
+        sub_list: List[str] = []
+        unsub_list: List[str] = []
+        invalid_list: List[str] = []
+
         for email_addr, action in intents.items():
             if action == 'subscribe':
-                if email_addr not in current_subs:
-                    current_subs.add(email_addr)
-                    self._send_feedback(email_addr, "正式订阅成功", "您已成功订阅 AI 资讯日报。")
+                if email_addr not in self._subs:
+                    self._subs.add(email_addr)
+                    self._subs_dirty = True
+                    sub_list.append(email_addr)
                     logger.info(f"正式订阅: {email_addr}")
             elif action == 'unsubscribe':
-                if email_addr in current_subs:
-                    current_subs.remove(email_addr)
-                    self._send_feedback(email_addr, "退订成功确认", "您已成功退订 AI 资讯日报。")
+                if email_addr in self._subs:
+                    self._subs.remove(email_addr)
+                    self._subs_dirty = True
+                    unsub_list.append(email_addr)
                     logger.info(f"正式退订: {email_addr}")
             elif action == 'invalid':
-                if email_addr not in current_subs:
-                    self._send_feedback(
-                        email_addr, 
-                        "指令未识别", 
-                        "系统收到您的请求，但无法确定您的意图。请发送“订阅AI资讯日报”或“退订AI资讯日报”进行操作。"
-                    )
+                if email_addr not in self._subs:
+                    invalid_list.append(email_addr)
                     logger.info(f"发送引导邮件: {email_addr}")
 
-        if current_subs != original_subs:
-            with open(self.subscriber_file, "w", encoding="utf-8") as f:
-                for addr in sorted(current_subs):
-                    f.write(f"{addr}\n")
+        feedbacks = [
+            (sub_list, "正式订阅成功", "您已成功订阅 AI 资讯日报。"),
+            (unsub_list, "退订成功确认", "您已成功退订 AI 资讯日报。"),
+            (
+                invalid_list, 
+                "指令未识别", 
+                "系统收到您的请求，但无法确定您的意图。请发送“订阅AI资讯日报”或“退订AI资讯日报”进行操作。"
+            ),
+        ]
+        feedbacks = [feedback for feedback in feedbacks if feedback[0]]
+        if feedbacks:
+            # 所有回执复用同一个 SMTP 会话，只握手和登录一次
+            server = None
+            try:
+                server = self._connect_smtp()
+                for recipients, subject, content in feedbacks:
+                    server = self._send_feedback(server, recipients, subject, content)
+            except Exception as e:
+                logger.error(f"连接 SMTP 服务器失败: {e}")
+            finally:
+                if server is not None:
+                    try:
+                        server.quit()
+                    except Exception: pass
+
+        self._persist()
+
+    @cached_property
+    def _subs(self) -> Set[str]:
+        """内存中待修改的订阅名单，首次访问时从文件加载"""
+        return self.load_subscribers()
+
+    def _persist(self):
+        """将内存中的订阅名单同步到文件，未发生变化时不做任何写入"""
+        if not self._subs_dirty:
+            return
+
+        added = self._subs - self._subs_cache
+        removed = self._subs_cache - self._subs
+        if removed:
+            # 有退订时才整体重写
+            self._compact(self._subs)
             logger.info("订阅列表已更新并同步")
+        elif added:
+            # 仅新增时直接追加，排序延后到压缩时进行；手工编辑后文件可能缺少末尾换行，先补上
+            prefix = "" if self._ends_with_newline() else "\n"
+            with open(self.subscriber_file, "a", encoding="utf-8") as f:
+                f.write(prefix + "\n".join(sorted(added)) + "\n")
+            self._unsorted_lines += len(added)
+            if self._unsorted_lines >= self.COMPACT_THRESHOLD:
+                self._compact(self._subs)
+            logger.info(f"订阅列表已追加 {len(added)} 个地址")
+
+        self._subs_cache = set(self._subs)
+        self._subs_dirty = False
+
+    def _ends_with_newline(self) -> bool:
+        """订阅文件不存在、为空或以换行结尾时返回 True"""
+        try:
+            with open(self.subscriber_file, "rb") as f:
+                if f.seek(0, os.SEEK_END) == 0:
+                    return True
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) == b"\n"
+        except FileNotFoundError:
+            return True
+
+    def _connect_smtp(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.config.smtp_host, self.config.smtp_port)
+        server.starttls()
+        server.login(self.user, self.password)
+        return server
+
+    def _ensure_smtp(self, server: smtplib.SMTP) -> smtplib.SMTP:
+        """用 NOOP 检查会话是否仍然可用，不可用时重新连接"""
+        try:
+            if server.noop()[0] == 250:
+                return server
+        except smtplib.SMTPServerDisconnected:
+            pass
+        logger.warning("SMTP 会话已断开，正在重新连接...")
+        server.close()
+        return self._connect_smtp()
 
-    def _send_feedback(self, to_email: str, subject: str, content: str):
+    def _send_feedback(self, server: smtplib.SMTP, recipients: List[str], subject: str, content: str) -> smtplib.SMTP:
+        """
+        在已建立的会话上向一组收件人发送同一封回执，收件人只出现在信封中以互相隐藏
+
+        Returns:
+            发送后可继续使用的会话（断线重连时为新会话）
+        """
         msg = MIMEText(content, "plain", "utf-8")
         msg["Subject"] = subject
         msg["From"] = self.config.sender or self.user
-        msg["To"] = to_email
+        msg["To"] = "undisclosed-recipients:;"
         msg["Date"] = formatdate(localtime=True)
         try:
-            with smtplib.SMTP(self.config.smtp_host, self.config.smtp_port) as server:
-                server.starttls()
-                server.login(self.user, self.password)
-                server.sendmail(self.user, [to_email], msg.as_string())
+            server = self._ensure_smtp(server)
+            try:
+                server.sendmail(self.user, recipients, msg.as_string())
+            except smtplib.SMTPServerDisconnected:
+                # 发送途中断线，重连后只重试一次
+                server.close()
+                server = self._connect_smtp()
+                server.sendmail(self.user, recipients, msg.as_string())
         except Exception as e:
-            logger.error(f"发送回执邮件失败 [{to_email}]: {e}")
+            logger.error(f"发送回执邮件失败 [{', '.join(recipients)}]: {e}")
+        return server
+
+    def _compact(self, subs: Set[str]):
+        """按排序结果整体重写订阅文件，清理追加产生的乱序与重复"""
+        content = "\n".join(sorted(subs)) + "\n" if subs else ""
+        self._atomic_write(self.subscriber_file, content)
+        self._unsorted_lines = 0
 
     def load_subscribers(self) -> Set[str]:
+        """返回订阅名单的副本，文件只在首次调用时读取"""
+        if self._subs_cache is None:
+            self._subs_cache = self._read_subscriber_file()
+        return set(self._subs_cache)
+
+    def _read_subscriber_file(self) -> Set[str]:
         if not self.subscriber_file.exists(): return set()
         with open(self.subscriber_file, "r", encoding="utf-8") as f:
-            return {line.strip().lower() for line in f if line.strip()}
+            lines = [line.strip().lower() for line in f if line.strip()]
+        # 统计末尾未排序（追加写入）的行数，超过阈值时触发压缩
+        sorted_prefix = 1 if lines else 0
+        while sorted_prefix < len(lines) and lines[sorted_prefix - 1] < lines[sorted_prefix]:
+            sorted_prefix += 1
+        self._unsorted_lines = len(lines) - sorted_prefix
+        return set(lines)
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
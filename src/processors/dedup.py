@@ -2,19 +2,39 @@
 新闻去重模块
 基于标题相似度去除重复新闻
 """
-import sys
 import logging
 import re
-from difflib import SequenceMatcher
-from pathlib import Path
 from typing import List, Tuple
 
-# 添加src目录到路径
-sys.path.insert(0, str(Path(__file__).parent.parent))
+from rapidfuzz import fuzz
+
 from crawlers.base import NewsItem
 
 logger = logging.getLogger(__name__)
 
+_URL_NORM_RE = re.compile(r'^(?:https?://)?(?:www\.)?(.*?)/*$', re.IGNORECASE | re.DOTALL)
+
+
+class _TitleTranslationTable(dict):
+    """
+    标题规范化用的 str.translate 映射表
+    
+    按需计算每个字符转小写后的结果，非单词、非空白、非中文的字符替换为空格，
+    计算结果缓存在表中
+    """
+    
+    @staticmethod
+    def _keep(c: str) -> bool:
+        # 与正则 [\w\s\u4e00-\u9fff] 一致
+        return c.isalnum() or c == '_' or c.isspace() or '\u4e00' <= c <= '\u9fff'
+    
+    def __missing__(self, codepoint: int) -> str:
+        result = ''.join(c if self._keep(c) else ' ' for c in chr(codepoint).lower())
+        self[codepoint] = result
+        return result
+
+
+_TITLE_TABLE = _TitleTranslationTable()
 
 class Deduplicator:
     """新闻去重器"""
@@ -57,53 +77,41 @@ class Deduplicator:
                 url_unique.append(item)
         
         # 第二步：标题相似度去重
-        result = []
+        # 已保留新闻的规范化标题随结果一起保存，避免重复规范化
+        result: List[Tuple[NewsItem, str]] = []
         for item in url_unique:
             is_duplicate = False
             normalized_title = self._normalize_title(item.title)
             
-            for i, existing in enumerate(result):
-                existing_title = self._normalize_title(existing.title)
+            for i, (existing, existing_title) in enumerate(result):
                 similarity = self._similarity(normalized_title, existing_title)
                 
                 if similarity >= self.similarity_threshold:
                     is_duplicate = True
                     # 保留分数更高的
                     if item.score > existing.score:
-                        result[i] = item
+                        result[i] = (item, normalized_title)
                     break
             
             if not is_duplicate:
-                result.append(item)
+                result.append((item, normalized_title))
         
         logger.info(
             f"去重: {original_count} -> {len(result)} "
             f"(移除 {original_count - len(result)} 条重复)"
         )
         
-        return result
+        return [item for item, _ in result]
     
     def _normalize_url(self, url: str) -> str:
-        """规范化URL用于比较"""
-        # 移除协议前缀
-        url = re.sub(r'^https?://', '', url)
-        # 移除末尾斜杠
-        url = url.rstrip('/')
-        # 移除www前缀
-        url = re.sub(r'^www\.', '', url)
-        # 转小写
-        return url.lower()
+        """规范化URL用于比较：去掉协议、www 前缀和末尾斜杠，转小写"""
+        return _URL_NORM_RE.match(url).group(1).lower()
     
     def _normalize_title(self, title: str) -> str:
-        """规范化标题用于比较"""
-        # 转小写
-        title = title.lower()
-        # 移除标点符号
-        title = re.sub(r'[^\w\s\u4e00-\u9fff]', ' ', title)
-        # 压缩空白
-        title = re.sub(r'\s+', ' ', title)
-        return title.strip()
+        """规范化标题用于比较：转小写、标点替换为空格、压缩空白"""
+        # 一次 translate 完成转小写和去标点，split/join 压缩并去除首尾空白
+        return ' '.join(title.translate(_TITLE_TABLE).split())
     
     def _similarity(self, s1: str, s2: str) -> float:
-        """计算两个字符串的相似度"""
-        return SequenceMatcher(None, s1, s2).ratio()
+        """计算两个字符串的相似度 (0-1)"""
+        return fuzz.ratio(s1, s2) / 100.0
@@ -2,19 +2,22 @@
 AI关键词过滤器
 过滤出与AI相关的新闻
 """
-import sys
 import logging
 import re
-from pathlib import Path
-from typing import List, Optional, Set
+import threading
+from typing import Dict, List, Optional, Pattern, Set, Tuple
+
+import ahocorasick
 
-# 添加src目录到路径
-sys.path.insert(0, str(Path(__file__).parent.parent))
 from crawlers.base import NewsItem
 from config import AI_KEYWORDS
 
 logger = logging.getLogger(__name__)
 
+# 按关键词列表缓存已构建的匹配器，避免每次实例化重复编译
+_MATCHER_CACHE: Dict[Tuple[str, ...], tuple] = {}
+_MATCHER_LOCK = threading.Lock()
+
 
 class AIKeywordFilter:
     """AI关键词过滤器"""
@@ -28,24 +31,58 @@ class AIKeywordFilter:
         """
         self.keywords = keywords or AI_KEYWORDS
         
-        # 预编译正则表达式以提高性能
-        # 对于英文关键词，使用单词边界匹配
-        # 对于中文关键词，直接匹配
-        self._patterns = []
-        for kw in self.keywords:
-            if self._is_ascii(kw):
-                # 英文关键词，使用单词边界（忽略大小写）
-                pattern = re.compile(r'\b' + re.escape(kw) + r'\b', re.IGNORECASE)
-            else:
-                # 中文关键词，直接匹配
-                pattern = re.compile(re.escape(kw), re.IGNORECASE)
-            self._patterns.append((kw, pattern))
+        # 相同关键词列表的正则与自动机只构建一次，在所有实例间共享
+        key = tuple(self.keywords)
+        matchers = _MATCHER_CACHE.get(key)
+        if matchers is None:
+            with _MATCHER_LOCK:
+                matchers = _MATCHER_CACHE.get(key)
+                if matchers is None:
+                    matchers = _MATCHER_CACHE[key] = self._build_matchers(self.keywords)
+        self._ascii_re, self._ascii_needles, self._cjk_needles, self._automaton = matchers
+    
+    @classmethod
+    def _build_matchers(
+        cls, keywords: List[str]
+    ) -> Tuple[Optional[Pattern], Tuple[str, ...], Tuple[str, ...], ahocorasick.Automaton]:
+        """
+        构建关键词匹配器
+        
+        Returns:
+            (英文关键词正则, 英文关键词小写子串, 中文关键词小写子串, Aho-Corasick 自动机)
+        """
+        # 英文关键词需要单词边界，合并为一个交替正则用于确认
+        # 中文关键词直接子串匹配即可
+        ascii_kws = [kw for kw in keywords if cls._is_ascii(kw)]
+        cjk_kws = [kw for kw in keywords if not cls._is_ascii(kw)]
+        ascii_re = (
+            re.compile(r'\b(?:' + '|'.join(map(re.escape, ascii_kws)) + r')\b', re.IGNORECASE)
+            if ascii_kws else None
+        )
+        ascii_needles = tuple(kw.lower() for kw in ascii_kws)
+        cjk_needles = tuple(kw.lower() for kw in cjk_kws)
+        
+        # Aho-Corasick 自动机，一次扫描即可找出全部（可重叠的）关键词
+        automaton = ahocorasick.Automaton()
+        for kw in keywords:
+            kw_lower = kw.lower()
+            automaton.add_word(kw_lower, (kw, len(kw_lower), cls._is_ascii(kw)))
+        automaton.make_automaton()
+        
+        return ascii_re, ascii_needles, cjk_needles, automaton
     
     @staticmethod
     def _is_ascii(text: str) -> bool:
         """检查是否为纯ASCII字符"""
         return all(ord(c) < 128 for c in text)
     
+    @staticmethod
+    def _is_word_boundary(text: str, index: int) -> bool:
+        """判断 text[index] 之前是否为单词边界，与正则 \\b 语义一致"""
+        left = index > 0 and (text[index - 1].isalnum() or text[index - 1] == '_')
+        right = index < len(text) and (text[index].isalnum() or text[index] == '_')
+        return left != right
+    
     def matches(self, item: NewsItem) -> bool:
         """
         检查新闻是否匹配AI关键词
@@ -58,9 +95,11 @@ class AIKeywordFilter:
         """
         text = f"{item.title} {item.summary}".lower()
         
-        for kw, pattern in self._patterns:
-            if pattern.search(text):
-                return True
+        # 先用子串查找快速排除，英文命中后再用正则确认单词边界（避免 "said" 命中 "ai"）
+        if any(needle in text for needle in self._cjk_needles):
+            return True
+        if any(needle in text for needle in self._ascii_needles):
+            return bool(self._ascii_re.search(text))
         
         return False
     
@@ -94,11 +133,17 @@ class AIKeywordFilter:
         Returns:
             匹配到的关键词集合
         """
-        text = f"{item.title} {item.summary}"
+        text = f"{item.title} {item.summary}".lower()
         matched = set()
         
-        for kw, pattern in self._patterns:
-            if pattern.search(text):
-                matched.add(kw)
+        for end, (kw, length, needs_boundary) in self._automaton.iter(text):
+            if kw in matched:
+                continue
+            start = end - length + 1
+            if needs_boundary and not (
+                self._is_word_boundary(text, start) and self._is_word_boundary(text, end + 1)
+            ):
+                continue
+            matched.add(kw)
         
         return matched
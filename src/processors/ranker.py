@@ -2,18 +2,19 @@
 新闻排序和选取模块
 优化权重分配，提升社交媒体内容可见度
 """
-import sys
+import bisect
 import logging
 from datetime import datetime, timedelta, timezone
-from pathlib import Path
 from typing import List, Optional
 
-# 添加src目录到路径
-sys.path.insert(0, str(Path(__file__).parent.parent))
 from crawlers.base import NewsItem
 
 logger = logging.getLogger(__name__)
 
+# 时效分档：发布时长（小时）小于 _RECENCY_HOURS[i] 时得分为 _RECENCY_SCORES[i]
+_RECENCY_HOURS = (1, 6, 12, 24, 48)
+_RECENCY_SCORES = (1.0, 0.9, 0.8, 0.75, 0.6, 0.2)  # 放宽 24-48 小时的分数
+
 
 class NewsRanker:
     """新闻排序器"""
@@ -29,6 +30,8 @@ class NewsRanker:
         self.recency_weight = recency_weight
         self.score_weight = score_weight
         self.source_weight = source_weight
+        self._now = datetime.now(timezone.utc)
+        self._max_score = 0.0
         
         # 来源优先级 - 优化权重，让社交媒体内容更容易出现
         self.source_priority = {
@@ -48,9 +51,13 @@ class NewsRanker:
         if not items:
             return []
         
+        # 当前时间与最高分在整批中不变，只需计算一次
+        self._now = datetime.now(timezone.utc)
+        self._max_score = max((i.score for i in items if i.score > 0), default=0.0)
+        
         scored_items = []
         for item in items:
-            final_score = self._calculate_score(item, items)
+            final_score = self._calculate_score(item)
             scored_items.append((item, final_score))
         
         scored_items.sort(key=lambda x: x[1], reverse=True)
@@ -59,9 +66,9 @@ class NewsRanker:
         logger.info(f"排序完成: 从 {len(items)} 条中选取 Top {len(result)}")
         return result
     
-    def _calculate_score(self, item: NewsItem, all_items: List[NewsItem]) -> float:
+    def _calculate_score(self, item: NewsItem) -> float:
         recency_score = self._recency_score(item.pub_date)
-        raw_score = self._normalize_score(item.score, all_items)
+        raw_score = self._normalize_score(item.score)
         source_score = self.source_priority.get(item.source, 0.7) # 默认来源分提高
         
         return (
@@ -71,27 +78,15 @@ class NewsRanker:
         )
     
     def _recency_score(self, pub_date: Optional[datetime]) -> float:
-        now = datetime.now(timezone.utc)
         if not pub_date: return 0.5
         if pub_date.tzinfo is None:
             pub_date = pub_date.replace(tzinfo=timezone.utc)
         
-        try:
-            age = now - pub_date
-            if age.total_seconds() < 0: return 1.0
-            hours = age.total_seconds() / 3600
-            if hours < 1: return 1.0
-            if hours < 6: return 0.9
-            if hours < 12: return 0.8
-            if hours < 24: return 0.75
-            if hours < 48: return 0.6 # 放宽 24-48 小时的分数
-            return 0.2
-        except Exception:
-            return 0.5
+        hours = (self._now - pub_date).total_seconds() / 3600
+        # 未来时间（负数）同样落在第一档
+        return _RECENCY_SCORES[bisect.bisect_right(_RECENCY_HOURS, hours)]
     
-    def _normalize_score(self, score: float, all_items: List[NewsItem]) -> float:
+    def _normalize_score(self, score: float) -> float:
         if score <= 0: return 0.0
-        all_scores = [i.score for i in all_items if i.score > 0]
-        if not all_scores: return 0.5 # 默认给个中间分
-        max_score = max(all_scores)
-        return min(score / max_score, 1.0)
+        if not self._max_score: return 0.5 # 默认给个中间分
+        return min(score / self._max_score, 1.0)
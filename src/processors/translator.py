@@ -1,100 +1,427 @@
 """
 新闻翻译模块 - 最终兼容版
-使用 GET 请求确保 API Key 认证 100% 成功
+API Key 通过查询参数传递确保认证成功，待翻译文本批量放在 POST 表单中
 """
 import logging
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
-import html
-from typing import List
+import time
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import sys
-
-# 添加src目录到路径
-sys.path.insert(0, str(Path(__file__).parent.parent))
+from typing import Dict, List, Optional, Tuple
 
 from crawlers.base import NewsItem
 from config import TranslationConfig, CHINESE_SOURCES
 
 logger = logging.getLogger(__name__)
 
+_CJK_RE = re.compile(r'[\u4e00-\u9fff]')
+# 平假名/片假名：含假名的文本是日文，即使汉字很多也需要翻译
+_KANA_RE = re.compile(r'[\u3040-\u30ff]')
+# 不值得翻译的文本：整段是链接，或字母少于 3 个（编号、纯标点等）
+_URL_ONLY_RE = re.compile(r'https?://\S+')
+_LETTER_RE = re.compile(r'[^\W\d_]')
+# gtx 拼接多段文本时使用的分隔符，纯 ASCII 记号不会被翻译，纯文本模式下换行会保留
+_GTX_SEPARATOR = "###SEP###"
+
+# 持久化翻译缓存：同一标题/摘要跨天重复出现时无需再次请求 API
+CACHE_FILE = Path(__file__).parent.parent.parent / "data" / ".translation_cache.sqlite3"
+# 缓存有效期 30 天
+_CACHE_TTL = 30 * 24 * 3600
+# 限流与服务端临时错误，可以原样重试
+_RETRY_STATUS = (429, 500, 502, 503, 504)
+# 与批次内容相关（请求体过大、个别文本非法）的错误码，拆小批次后可能成功
+_SPLITTABLE_STATUS = (400, 413)
+# Google 对无效/过期/受限的 API Key 也返回 400，这类错误与批次内容无关，不能拆分重试
+_AUTH_ERROR_REASONS = frozenset({
+    "API_KEY_INVALID", "API_KEY_EXPIRED", "API_KEY_SERVICE_BLOCKED", "keyInvalid", "keyExpired",
+})
+# 单条 SQL 的参数个数上限（SQLite 旧版本默认 999）
+_CACHE_QUERY_CHUNK = 500
+
 class Translator:
+    # Google v2 单次请求最多接受 128 段文本，建议总长度不超过 5000 字符
+    BATCH_SIZE = 128
+    MAX_BATCH_CHARS = 5000
+    # 并发请求数
+    MAX_WORKERS = 8
+    # 每秒最多发起的请求数，避免并发突发触发 Google 的 QPS 配额
+    MAX_QPS = 10
+    # 熔断：连续失败达到阈值后，在冷却时间内不再请求 API
+    CIRCUIT_FAILURE_THRESHOLD = 5
+    CIRCUIT_RESET_SECONDS = 60
+
     def __init__(self, config: TranslationConfig):
         self.config = config
         self.api_url = "https://translation.googleapis.com/language/translate/v2"
+        # 未配置 API Key 时的降级接口（免费、无需鉴权；不支持批量，每次请求只翻译同一条新闻的标题与摘要）
+        self.gtx_url = "https://translate.googleapis.com/translate_a/single"
+        # 复用同一会话，连接池与并发数一致，各线程的 TCP/TLS 连接在批次间保持复用；
+        # 连接建立失败等网络抖动以及 429/5xx 由 urllib3 按指数退避（带抖动）自动重试，
+        # 并遵循 Google 返回的 Retry-After；读超时不在此重试（read=False 原样抛出 ReadTimeout），
+        # 由 _translate_chunk 整批重试一次
+        self.session = requests.Session()
+        retry = Retry(
+            total=5, read=False, backoff_factor=0.5, backoff_jitter=0.5, backoff_max=30,
+            status_forcelist=_RETRY_STATUS, allowed_methods=None,
+            respect_retry_after_header=True, raise_on_status=False,
+        )
+        self.session.mount("https://", HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.MAX_WORKERS, max_retries=retry
+        ))
+        self.cache = self._open_cache()
+        # 最小请求间隔限流：所有工作线程共享下一次允许发送的时间点
+        self._rate_lock = threading.Lock()
+        self._next_request_at = 0.0
+        self._circuit_lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._circuit_open_until = 0.0
         
         if not self.config.api_key:
-            logger.error("!!! 错误: GOOGLE_TRANSLATE_API_KEY 环境变量未设置 !!!")
+            logger.warning("GOOGLE_TRANSLATE_API_KEY 未设置，降级使用免费 gtx 接口（每条新闻一次请求）")
         else:
             logger.info("翻译器初始化成功，准备执行翻译...")
     
     def translate_batch(self, items: List[NewsItem]) -> List[NewsItem]:
-        if not self.config.api_key:
-            return items
-        
-        translated_count = 0
         skipped_count = 0
         
+        # 1. 收集待翻译的 (新闻, 目标字段, 原文)，中文源直接跳过
+        jobs: List[Tuple[NewsItem, str, str]] = []
+        for item in items:
+            if item.source.lower() in CHINESE_SOURCES or self._is_mostly_chinese(item.title):
+                item.is_chinese_source = True
+                skipped_count += 1
+                continue
+            if self._is_translatable(item.title):
+                jobs.append((item, "title_zh", item.title))
+            else:
+                skipped_count += 1
+            if item.summary and len(item.summary) > 5 and self._is_translatable(item.summary):
+                jobs.append((item, "summary_zh", item.summary))
+        
+        # 2. 先查持久化缓存，命中的直接写回，只有未命中的文本才请求 API
+        cached = self._cache_lookup([text for _, _, text in jobs])
+        # 相同原文（多个源转载的同一标题）只翻译一次，译文写回所有引用它的字段
+        pending: Dict[str, List[Tuple[NewsItem, str]]] = {}
+        for item, field, text in jobs:
+            # 标题已被识别为中文的新闻，摘要也不再翻译（标题总是先于摘要入队）
+            if item.is_chinese_source:
+                continue
+            hit = cached.get(self._cache_key(text))
+            if hit:
+                self._apply_translation(item, field, *hit)
+            else:
+                pending.setdefault(text, []).append((item, field))
+        if cached:
+            logger.info(f"翻译缓存命中 {len(jobs) - sum(map(len, pending.values()))} 条")
+        
+        # 3. 按批次打包，多个批次并发请求（并发数由线程池上限约束）
+        chunks = self._make_chunks(pending)
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            results = executor.map(self._translate_texts, chunks)
+            # 4. 将译文写回对应字段
+            fresh: Dict[str, Tuple[str, str]] = {}
+            for chunk, translations in zip(chunks, results):
+                for text, (translated, source_lang) in zip(chunk, translations):
+                    if not translated:
+                        continue
+                    fresh[text] = (translated, source_lang)
+                    for item, field in pending[text]:
+                        self._apply_translation(item, field, translated, source_lang)
+        self._cache_store(fresh)
+        
+        translated_count = 0
         for item in items:
-            try:
-                # 1. 检查是否已经是中文源
-                if item.source.lower() in CHINESE_SOURCES or self._is_mostly_chinese(item.title):
-                    item.is_chinese_source = True
-                    skipped_count += 1
-                    continue
-                
-                # 2. 执行标题翻译
-                title_zh = self._translate_text(item.title)
-                if title_zh:
-                    item.title_zh = title_zh
-                    translated_count += 1
-                    logger.info(f"[翻译成功] {item.title[:15]}... -> {title_zh[:15]}...")
-                    
-                    # 3. 执行摘要翻译
-                    if item.summary and len(item.summary) > 5:
-                        summary_zh = self._translate_text(item.summary)
-                        if summary_zh:
-                            item.summary_zh = summary_zh
-                
-            except Exception as e:
-                logger.error(f"处理新闻翻译时发生意外错误: {e}")
+            if item.title_zh:
+                translated_count += 1
+                logger.info(f"[翻译成功] {item.title[:15]}... -> {item.title_zh[:15]}...")
         
         logger.info(f"=== 翻译任务总结: 成功 {translated_count} 条, 跳过 {skipped_count} 条 ===")
         return items
     
-    def _translate_text(self, text: str) -> str:
-        """调用 Google 翻译 API"""
-        if not text or not text.strip():
-            return ""
-            
+    def _make_chunks(self, pending: Dict[str, List[Tuple[NewsItem, str]]]) -> List[List[str]]:
+        """
+        切分请求批次
+
+        v2：按长度降序装箱，每批不超过条数与字符数上限，各批耗时更均衡
+        gtx：每次只接受一段文本，用分隔符把同一新闻自己的标题与摘要拼成一次请求
+        （标题命中缓存、摘要被过滤等情况下该新闻只剩一条，单独成批）
+        """
+        if not self.config.api_key:
+            groups: Dict[int, List[str]] = {}
+            for text, targets in pending.items():
+                # 多条新闻共用的文本归入第一个引用它的新闻
+                groups.setdefault(id(targets[0][0]), []).append(text)
+            return list(groups.values())
+        chunks: List[List[str]] = []
+        current: List[str] = []
+        chars = 0
+        for text in sorted(pending, key=len, reverse=True):
+            # 超长文本单独成批
+            if current and (len(current) >= self.BATCH_SIZE or chars + len(text) > self.MAX_BATCH_CHARS):
+                chunks.append(current)
+                current, chars = [], 0
+            current.append(text)
+            chars += len(text)
+        if current:
+            chunks.append(current)
+        return chunks
+    
+    def _apply_translation(self, item: NewsItem, field: str, translated: str, source_lang: str):
+        """写回译文；Google 检测到原文已是目标语言时按中文源处理，不写译文"""
+        if source_lang == self.config.target_language:
+            if field == "title_zh":
+                item.is_chinese_source = True
+            return
+        setattr(item, field, translated)
+    
+    def close(self):
+        """释放 HTTP 连接池与缓存数据库连接"""
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+    
+    def _translate_texts(self, texts: List[str]) -> List[Tuple[str, str]]:
+        """调用 Google 翻译 API 批量翻译，返回与输入等长的 (译文, 检测到的源语言) 列表，失败的位置为空字符串"""
+        results = [("", "")] * len(texts)
+        # 空文本不发送
+        indexes = [i for i, text in enumerate(texts) if text and text.strip()]
+        if not indexes:
+            return results
+        
+        translations = self._translate_chunk([texts[i] for i in indexes])
+        for i, translated in zip(indexes, translations):
+            results[i] = translated
+        return results
+    
+    def _translate_chunk(self, texts: List[str], timeout_retried: bool = False) -> List[Tuple[str, str]]:
+        """
+        翻译一个批次；若失败与批次内容有关，则对半拆分后分别重试，只让出错的那条留空
+
+        读超时与批次内容无关，不拆分，整批最多重试一次；连接超时已由 urllib3 重试过，直接计为失败
+        """
+        if self._circuit_is_open():
+            return [("", "")] * len(texts)
         try:
-            # 移除文本中的 HTML 标签（如果有）
-            clean_text = re.sub(r'<[^>]+>', '', text)
-            
-            params = {
-                'q': clean_text,
-                'target': 'zh-CN',
-                'key': self.config.api_key
-            }
-            
-            response = requests.get(self.api_url, params=params, timeout=15)
-            
-            if response.status_code == 200:
-                result = response.json()
-                translated = result['data']['translations'][0]['translatedText']
-                # Google 返回的内容可能包含 HTML 实体（如 &quot;），需要解码
-                return html.unescape(translated)
+            if self.config.api_key:
+                results = self._request_translations(texts)
             else:
-                logger.error(f"Google API 响应错误: {response.status_code} - {response.text}")
-                return ""
-                
+                results = self._request_gtx(texts)
+            self._record_success()
+            return results
+        except requests.ReadTimeout as e:
+            if not timeout_retried:
+                logger.warning(f"翻译请求超时（{len(texts)} 条），重试一次: {e}")
+                return self._translate_chunk(texts, timeout_retried=True)
+            logger.error(f"翻译请求再次超时，放弃该批次: {e}")
+            self._record_failure()
+            return [("", "")] * len(texts)
+        except ValueError as e:
+            if len(texts) == 1:
+                # 拆到单条仍失败，同样计入熔断（如持续返回 400 的故障）
+                logger.error(f"请求 Google 翻译 API 异常: {e}")
+                self._record_failure()
+                return [("", "")]
+            logger.warning(f"批量翻译失败（{len(texts)} 条），拆分后重试: {e}")
+            mid = len(texts) // 2
+            results: List[Tuple[str, str]] = []
+            for half in (texts[:mid], texts[mid:]):
+                # 前一半的失败可能已触发熔断，此时后一半不再请求
+                if self._circuit_is_open():
+                    results.extend([("", "")] * len(half))
+                else:
+                    results.extend(self._translate_chunk(half))
+            return results
         except Exception as e:
+            # 鉴权、配额、服务端错误等与批次内容无关，拆分重试没有意义
             logger.error(f"请求 Google 翻译 API 异常: {e}")
-            return ""
+            self._record_failure()
+            return [("", "")] * len(texts)
+    
+    def _request_translations(self, texts: List[str]) -> List[Tuple[str, str]]:
+        """发送一次批量翻译请求，返回与输入等长的 (译文, 检测到的源语言) 列表"""
+        # 爬虫已输出纯文本（HTML 在各爬虫中清理），原样发送
+        data = [('q', text) for text in texts]
+        data.append(('target', self.config.target_language))
+        # 按纯文本翻译：返回结果不含 HTML 实体，无需再 unescape
+        data.append(('format', 'text'))
+        
+        self._wait_rate_limit()
+        response = self.session.post(
+            self.api_url, params={'key': self.config.api_key}, data=data, timeout=15
+        )
+        
+        if response.status_code in _SPLITTABLE_STATUS and not self._is_auth_error(response):
+            raise ValueError(f"Google API 响应错误: {response.status_code} - {response.text}")
+        if response.status_code != 200:
+            raise RuntimeError(f"Google API 响应错误: {response.status_code} - {response.text}")
+        
+        # 单批最多 BATCH_SIZE 段短文本，响应体只有几十 KB，整体解析比流式解析更快
+        translations = orjson.loads(response.content)['data']['translations']
+        if len(translations) != len(texts):
+            raise ValueError(f"译文数量不匹配: 请求 {len(texts)} 条, 返回 {len(translations)} 条")
+        return [
+            (translation['translatedText'], translation.get('detectedSourceLanguage', ''))
+            for translation in translations
+        ]
+    
+    @staticmethod
+    def _is_auth_error(response: requests.Response) -> bool:
+        """解析 Google 错误响应体，判断是否为 API Key 无效等鉴权错误"""
+        try:
+            error = orjson.loads(response.content).get('error')
+        except (ValueError, AttributeError):
+            return False
+        if not isinstance(error, dict):
+            return False
+        if error.get('status') in ('UNAUTHENTICATED', 'PERMISSION_DENIED'):
+            return True
+        entries = [*error.get('details', []), *error.get('errors', [])]
+        return any(isinstance(entry, dict) and entry.get('reason') in _AUTH_ERROR_REASONS for entry in entries)
+    
+    def _request_gtx(self, texts: List[str]) -> List[Tuple[str, str]]:
+        """通过免费 gtx 接口翻译，多段文本以分隔符拼成一次请求，返回与输入等长的 (译文, 检测到的源语言) 列表"""
+        query = f"\n{_GTX_SEPARATOR}\n".join(texts)
+        params = {
+            'client': 'gtx', 'sl': 'auto', 'tl': self.config.target_language,
+            'dt': 't', 'dj': '1', 'source': 'input', 'q': query,
+        }
+        
+        self._wait_rate_limit()
+        response = self.session.get(self.gtx_url, params=params, timeout=15)
+        
+        if response.status_code in _SPLITTABLE_STATUS:
+            raise ValueError(f"gtx 接口响应错误: {response.status_code} - {response.text}")
+        if response.status_code != 200:
+            raise RuntimeError(f"gtx 接口响应错误: {response.status_code} - {response.text}")
+        
+        result = orjson.loads(response.content)
+        # 长文本会被拆成多个句子分别返回
+        translated = ''.join(sentence.get('trans', '') for sentence in result.get('sentences', []))
+        parts = translated.split(_GTX_SEPARATOR)
+        if len(parts) != len(texts):
+            # 分隔符在翻译中被改写，交给上层拆成单条重试
+            raise ValueError(f"gtx 分隔符数量不匹配: 请求 {len(texts)} 段, 返回 {len(parts)} 段")
+        # src 是对整段拼接文本检测出的单一语言，不能代表其中每一段，多段时不记录
+        source_lang = result.get('src', '') if len(texts) == 1 else ''
+        return [(part.strip(), source_lang) for part in parts]
+    
+    def _circuit_is_open(self) -> bool:
+        with self._circuit_lock:
+            return time.monotonic() < self._circuit_open_until
+    
+    def _record_success(self):
+        with self._circuit_lock:
+            self._consecutive_failures = 0
+    
+    def _record_failure(self):
+        """累计连续失败次数，达到阈值时打开熔断"""
+        with self._circuit_lock:
+            self._consecutive_failures += 1
+            if self._consecutive_failures < self.CIRCUIT_FAILURE_THRESHOLD:
+                return
+            self._consecutive_failures = 0
+            self._circuit_open_until = time.monotonic() + self.CIRCUIT_RESET_SECONDS
+        logger.error(f"翻译接口连续失败，熔断 {self.CIRCUIT_RESET_SECONDS} 秒，期间跳过翻译")
+    
+    def _wait_rate_limit(self):
+        """按 MAX_QPS 为每个请求预约发送时间，必要时休眠到预约时刻"""
+        interval = 1.0 / self.MAX_QPS
+        with self._rate_lock:
+            now = time.monotonic()
+            scheduled = max(now, self._next_request_at)
+            self._next_request_at = scheduled + interval
+        if scheduled > now:
+            time.sleep(scheduled - now)
+    
+    def _open_cache(self) -> Optional[sqlite3.Connection]:
+        """打开持久化翻译缓存并清理过期条目，失败时返回 None（退化为不使用缓存）"""
+        try:
+            CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(CACHE_FILE))
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "hash TEXT NOT NULL, lang TEXT NOT NULL, text TEXT NOT NULL, created REAL NOT NULL, "
+                "source_lang TEXT NOT NULL DEFAULT '', PRIMARY KEY (hash, lang))"
+            )
+            # 兼容早期没有 source_lang 列的缓存文件
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(translations)")}
+            if "source_lang" not in columns:
+                conn.execute("ALTER TABLE translations ADD COLUMN source_lang TEXT NOT NULL DEFAULT ''")
+            conn.execute("DELETE FROM translations WHERE created < ?", (time.time() - _CACHE_TTL,))
+            conn.commit()
+            return conn
+        except sqlite3.Error as e:
+            logger.warning(f"翻译缓存不可用，将直接请求 API: {e}")
+            return None
+    
+    @staticmethod
+    def _cache_key(text: str) -> str:
+        return hashlib.sha1(text.strip().encode('utf-8')).hexdigest()
+    
+    def _cache_lookup(self, texts: List[str]) -> Dict[str, Tuple[str, str]]:
+        """批量查询缓存，返回 {缓存键: (译文, 检测到的源语言)}"""
+        if self.cache is None or not texts:
+            return {}
+        keys = list({self._cache_key(text) for text in texts})
+        found: Dict[str, Tuple[str, str]] = {}
+        try:
+            for i in range(0, len(keys), _CACHE_QUERY_CHUNK):
+                part = keys[i:i + _CACHE_QUERY_CHUNK]
+                rows = self.cache.execute(
+                    f"SELECT hash, text, source_lang FROM translations "
+                    f"WHERE lang = ? AND hash IN ({','.join('?' * len(part))})",
+                    [self.config.target_language, *part],
+                )
+                found.update((key, (translated, source_lang)) for key, translated, source_lang in rows)
+        except sqlite3.Error as e:
+            logger.warning(f"读取翻译缓存失败: {e}")
+        return found
+    
+    def _cache_store(self, translations: Dict[str, Tuple[str, str]]):
+        """写入新译文（原文 -> (译文, 检测到的源语言)）"""
+        if self.cache is None or not translations:
+            return
+        now = time.time()
+        try:
+            with self.cache:
+                self.cache.executemany(
+                    "INSERT OR REPLACE INTO translations (hash, lang, text, created, source_lang) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(self._cache_key(text), self.config.target_language, translated, now, source_lang)
+                     for text, (translated, source_lang) in translations.items()],
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"写入翻译缓存失败: {e}")
+    
+    def _is_translatable(self, text: str) -> bool:
+        """过滤纯链接、编号、纯标点等翻译无意义的文本"""
+        text = text.strip()
+        if not text or _URL_ONLY_RE.fullmatch(text):
+            return False
+        # 找到第 3 个字母即可返回
+        letters = 0
+        for _ in _LETTER_RE.finditer(text):
+            letters += 1
+            if letters > 2:
+                return True
+        return False
     
     def _is_mostly_chinese(self, text: str) -> bool:
-        """判断是否包含中文"""
-        if not text:
+        """判断是否为中文（已是目标语言，无需翻译）"""
+        if not text or _KANA_RE.search(text):
             return False
-        chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', text))
-        return chinese_chars > 2
+        # 找到第 3 个中文字符即可返回，无需扫描全文
+        chinese_chars = 0
+        for _ in _CJK_RE.finditer(text):
+            chinese_chars += 1
+            if chinese_chars > 2:
+                return True
+        return False